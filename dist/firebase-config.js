@@ -21,6 +21,9 @@ const FIREBASE_SDK_URLS = {
   analytics: 'https://www.gstatic.com/firebasejs/10.7.1/firebase-analytics-compat.js'
 };
 
+// Model shards are stored little-endian; on matching hosts they can be viewed as a Float32Array directly
+const IS_LITTLE_ENDIAN = new Uint8Array(new Uint16Array([1]).buffer)[0] === 1;
+
 // Firebase initialization class for Chrome extensions
 class FirebaseManager {
   constructor() {
@@ -326,22 +329,15 @@ class ModelManager {
         throw new Error('Model base data not found in model_base document');
       }
       
-      // Fetch feature data chunks
-        const featureLogProbDoc = await this.firebaseManager.db.collection('nlp_models').doc('feature_log_prob').get();
-        const featureCountDoc = await this.firebaseManager.db.collection('nlp_models').doc('feature_count').get();
-        
-        if (!featureLogProbDoc.exists || !featureCountDoc.exists) {
-            throw new Error('Feature data chunks not found in Firestore');
-        }
-        
-        const featureLogProbData = featureLogProbDoc.data();
-        const featureCountData = featureCountDoc.data();
-      
-      // Reconstruct model data by parsing JSON strings back to arrays
+      // Fetch and decode the feature matrices
+      const [featureLogProb, featureCount] = await Promise.all([
+        this.fetchMatrix('feature_log_prob'),
+        this.fetchMatrix('feature_count')
+      ]);
       const reconstructedModelData = {
         ...modelBaseData.model_data,
-        feature_log_prob: JSON.parse(featureLogProbData.feature_log_prob_json),
-        feature_count: JSON.parse(featureCountData.feature_count_json)
+        feature_log_prob: featureLogProb,
+        feature_count: featureCount
       };
       
       const data = {
@@ -409,6 +405,50 @@ class ModelManager {
     }
   }
 
+  // Read a model matrix from its float32 shards (<name>_f32), falling back to the legacy JSON document
+  async fetchMatrix(name) {
+    const collection = this.firebaseManager.db.collection('nlp_models');
+    const shardedDoc = await collection.doc(`${name}_f32`).get();
+    if (shardedDoc.exists) {
+      return this.decodeFloat32Shards(shardedDoc.ref, shardedDoc.data());
+    }
+    
+    const legacyDoc = await collection.doc(name).get();
+    if (!legacyDoc.exists) {
+      throw new Error('Feature data chunks not found in Firestore');
+    }
+    return this.decodeJsonArrayField(legacyDoc.data(), name);
+  }
+
+  // Reassemble a row-major matrix stored as little-endian float32 shards in a subcollection
+  async decodeFloat32Shards(docRef, docData) {
+    const [rows, cols] = docData.array_shape;
+    const flat = new Float32Array(rows * cols);
+    const shardsSnapshot = await docRef.collection('shards').get();
+    
+    shardsSnapshot.forEach(shardDoc => {
+      const shard = shardDoc.data();
+      const bytes = shard.data.toUint8Array();
+      if (IS_LITTLE_ENDIAN && bytes.byteOffset % 4 === 0) {
+        // Native layout matches, so view the bytes as floats and bulk-copy them with one set()
+        flat.set(new Float32Array(bytes.buffer, bytes.byteOffset, shard.count), shard.start);
+        return;
+      }
+      const view = new DataView(bytes.buffer, bytes.byteOffset, bytes.byteLength);
+      for (let i = 0; i < shard.count; i++) {
+        flat[shard.start + i] = view.getFloat32(i * 4, true);
+      }
+    });
+    
+    // Callers expect plain nested arrays, so each row is still copied out of the flat buffer
+    return Array.from({ length: rows }, (_, row) => Array.from(flat.subarray(row * cols, (row + 1) * cols)));
+  }
+
+  // Decode a model array from its legacy JSON string document
+  decodeJsonArrayField(docData, fieldName) {
+    return JSON.parse(docData[`${fieldName}_json`]);
+  }
+
   isCacheValid() {
     return (
       this.modelCache &&
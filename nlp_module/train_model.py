@@ -7,17 +7,32 @@ from sklearn.metrics import (
     recall_score, f1_score, roc_auc_score, confusion_matrix
 )
 import re
-import pickle
 import os
+import json
+import email
 import numpy as np
+import joblib
+import lxml.html
 from datetime import datetime
-from bs4 import BeautifulSoup
-
-# Load the dataset
-df = pd.read_csv('../docs/datasets-code/fake_job_postings.csv')
+from joblib import Parallel, delayed, cpu_count
+from scipy import sparse
+from scipy.special import expit
+
+DATASET_PATH = '../docs/datasets-code/fake_job_postings.csv'
+TEXT_COLUMNS = ['title', 'location', 'department', 'company_profile', 'description', 'requirements', 'benefits']
+SITES_DIR = '../docs/sites/'
+
+# Preprocessing cache; rebuilt whenever the dataset, the sites or this script change
+CACHE_DIR = 'cache'
+CLEANED_CACHE = os.path.join(CACHE_DIR, 'cleaned.parquet')
+X_TRAIN_CACHE = os.path.join(CACHE_DIR, 'X_train.npz')
+X_TEST_CACHE = os.path.join(CACHE_DIR, 'X_test.npz')
+SPLIT_CACHE = os.path.join(CACHE_DIR, 'split_index.npz')
+VECTORIZER_CACHE = os.path.join(CACHE_DIR, 'vectorizer.joblib')
+SITE_TEXT_CACHE = os.path.join(CACHE_DIR, 'site_texts.json')
 
 # Basic English stop words (without NLTK dependency)
-stop_words = set([
+STOP_WORDS = frozenset([
     'i', 'me', 'my', 'myself', 'we', 'our', 'ours', 'ourselves', 'you', 'your', 'yours',
     'yourself', 'yourselves', 'he', 'him', 'his', 'himself', 'she', 'her', 'hers',
     'herself', 'it', 'its', 'itself', 'they', 'them', 'their', 'theirs', 'themselves',
@@ -29,41 +44,139 @@ stop_words = set([
     'further', 'then', 'once'
 ])
 
-def clean_text(text):
+# Punctuation; newlines are whitespace and fall out when the text is split
+_PUNCT_RE = re.compile(r'[^\w\s]')
+
+def clean_text(text, _stop=STOP_WORDS, _split=str.split):
+    # _stop and _split are bound at definition time so the token loop avoids global lookups
     if pd.isnull(text):
         return ""
-    text = re.sub(r'[\r\n]+', ' ', text)  # remove newlines
-    text = re.sub(r'[^\w\s]', '', text)  # remove punctuation
+    text = _PUNCT_RE.sub('', text)  # remove punctuation
     text = text.lower()
-    text = ' '.join([word for word in text.split() if word not in stop_words and len(word) > 2])
+    text = ' '.join([word for word in _split(text) if len(word) > 2 and word not in _stop])
     return text
 
+# Matches stop words and tokens of two characters or fewer as whole whitespace-separated
+# tokens, the same units str.split gives clean_text. \b would split on combining marks
+# that lowercasing can introduce ("İ".lower() is "i" + U+0307).
+_STOP_WORD_RE = re.compile(r'(?<!\S)(?:' + '|'.join(map(re.escape, sorted(STOP_WORDS))) + r'|\S{1,2})(?!\S)')
+
+def clean_text_series(texts):
+    """Vectorized equivalent of clean_text for a whole Series of documents"""
+    texts = texts.fillna('')
+    texts = texts.str.replace(_PUNCT_RE, '', regex=True)  # remove punctuation
+    texts = texts.str.lower()
+    texts = texts.str.replace(_STOP_WORD_RE, '', regex=True)  # drop stop words and short tokens
+    texts = texts.str.replace(r'\s+', ' ', regex=True).str.strip()  # collapse whitespace left behind
+    return texts
+
+def parallel_clean_text_series(texts, n_jobs=-1):
+    """Run clean_text_series over contiguous chunks of the Series on all CPU cores"""
+    n_chunks = cpu_count() if n_jobs == -1 else n_jobs
+    chunk_size = max(1, -(-len(texts) // n_chunks))
+    chunks = [texts.iloc[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+    cleaned = Parallel(n_jobs=n_jobs, backend='loky')(delayed(clean_text_series)(chunk) for chunk in chunks)
+    return pd.concat(cleaned) if cleaned else texts
+
+def _visible_text(doc):
+    """Text content of a parsed HTML document, without script, style and template code"""
+    # text_content() would otherwise include inline JS and CSS, which BeautifulSoup's get_text() skipped
+    for element in doc.xpath('//script|//style|//noscript|//template'):
+        element.drop_tree()
+    return doc.text_content()
+
+def _extract_site_text(path):
+    """Extract and clean the text content of a single MHTML file"""
+    try:
+        with open(path, 'rb') as f:
+            content = f.read()
+        # Only the text/html parts carry page text; skip base64 images, fonts and stylesheets
+        texts = []
+        for part in email.message_from_bytes(content).walk():
+            if part.get_content_type() == 'text/html':
+                payload = part.get_payload(decode=True)
+                if payload:
+                    parser = lxml.html.HTMLParser(encoding=part.get_content_charset())
+                    texts.append(_visible_text(lxml.html.document_fromstring(payload, parser=parser)))
+        if not texts:
+            # Not a MIME archive, treat the whole file as HTML
+            texts.append(_visible_text(lxml.html.document_fromstring(content)))
+        return clean_text(' '.join(texts))
+    except Exception as e:
+        print(f"Error reading {os.path.basename(path)}: {e}")
+        return None
+
+def list_site_files():
+    """List (path, mtime) for every saved MHTML site document"""
+    if not os.path.exists(SITES_DIR):
+        return []
+    with os.scandir(SITES_DIR) as entries:
+        return [(entry.path, entry.stat().st_mtime) for entry in entries
+                if entry.is_file() and entry.name.endswith('.mhtml')]
+
 def extract_fraud_patterns_from_sites():
     """Extract fraud patterns from saved website documents"""
-    sites_dir = '../docs/sites/'
+    site_files = list_site_files()
+    if not site_files:
+        return []
+    
+    site_cache = {}
+    # Texts cleaned by an older version of this script are discarded
+    if is_cache_fresh([SITE_TEXT_CACHE], [__file__]):
+        with open(SITE_TEXT_CACHE, 'r', encoding='utf-8') as f:
+            site_cache = json.load(f)
+    
+    # Only parse files that are new or modified since they were last cached
+    stale_paths = [path for path, mtime in site_files if site_cache.get(path, {}).get('mtime') != mtime]
+    # Each file parses independently, so spread them across processes
+    texts = Parallel(n_jobs=-1, backend='loky')(delayed(_extract_site_text)(path) for path in stale_paths)
+    parsed = dict(zip(stale_paths, texts))
+    
     fraud_patterns = []
+    updated_cache = {}
+    for path, mtime in site_files:
+        text = parsed[path] if path in parsed else site_cache[path]['text']
+        if text is not None:
+            updated_cache[path] = {'mtime': mtime, 'text': text}
+            fraud_patterns.append(text)
     
-    if os.path.exists(sites_dir):
-        for filename in os.listdir(sites_dir):
-            if filename.endswith('.mhtml'):
-                try:
-                    with open(os.path.join(sites_dir, filename), 'r', encoding='utf-8', errors='ignore') as f:
-                        content = f.read()
-                        # Extract text content from MHTML
-                        soup = BeautifulSoup(content, 'html.parser')
-                        text = soup.get_text()
-                        fraud_patterns.append(clean_text(text))
-                except Exception as e:
-                    print(f"Error reading {filename}: {e}")
+    with open(SITE_TEXT_CACHE, 'w', encoding='utf-8') as f:
+        json.dump(updated_cache, f)
     
     return fraud_patterns
 
+def get_source_paths():
+    """List the input files the cleaned dataset is built from"""
+    # The script itself counts, so edits to STOP_WORDS or clean_text invalidate the cache
+    paths = [DATASET_PATH, __file__]
+    if os.path.exists(SITES_DIR):
+        paths.append(SITES_DIR)
+        paths.extend(path for path, _ in list_site_files())
+    return paths
+
+def is_cache_fresh(cache_paths, source_paths):
+    """Check that every cache file exists and is newer than all of its sources"""
+    try:
+        oldest_cache = min(os.path.getmtime(path) for path in cache_paths)
+    except OSError:
+        return False
+    return all(os.path.getmtime(path) < oldest_cache for path in source_paths if os.path.exists(path))
+
+def top_weighted_features(feature_names, weights, k, largest=True):
+    """Return the k (feature, weight) pairs with the largest (or smallest) weights, in order"""
+    keys = -weights if largest else weights
+    k = min(k, len(keys))
+    top_idx = np.argpartition(keys, k - 1)[:k]
+    top_idx = top_idx[np.argsort(keys[top_idx])]
+    return list(zip(feature_names[top_idx], weights[top_idx]))
+
 def generate_markdown_report(accuracy, precision, recall, f1, roc_auc, cm, 
                            top_fraud_features, top_legit_features, 
                            total_samples, train_samples, test_samples):
     """Generate a comprehensive markdown evaluation report"""
     
-    report_content = f"""# Fraud Detection Model Evaluation Report
+    # Collect fragments and join once at the end instead of growing one string with +=
+    parts = [f"""# Fraud Detection Model Evaluation Report
 
 **Generated on:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
 
@@ -117,13 +230,13 @@ These features strongly indicate fraudulent job postings:
 
 | Rank | Feature | Weight | Impact |
 |------|---------|--------|--------|
-"""
+"""]
     
     for i, (feature, weight) in enumerate(top_fraud_features[:10], 1):
         impact = "High" if weight > 2 else "Medium" if weight > 1 else "Low"
-        report_content += f"| {i} | `{feature}` | {weight:.4f} | {impact} |\n"
+        parts.append(f"| {i} | `{feature}` | {weight:.4f} | {impact} |\n")
     
-    report_content += f"""
+    parts.append(f"""
 
 ### Top 10 Legitimacy Indicators
 
@@ -131,16 +244,16 @@ These features strongly indicate legitimate job postings:
 
 | Rank | Feature | Weight | Impact |
 |------|---------|--------|--------|
-"""
+""")
     
     for i, (feature, weight) in enumerate(top_legit_features[:10], 1):
         impact = "High" if abs(weight) > 2 else "Medium" if abs(weight) > 1 else "Low"
-        report_content += f"| {i} | `{feature}` | {weight:.4f} | {impact} |\n"
+        parts.append(f"| {i} | `{feature}` | {weight:.4f} | {impact} |\n")
     
     # Performance assessment
     performance_level = "Excellent" if f1 > 0.9 else "Good" if f1 > 0.8 else "Moderate" if f1 > 0.7 else "Needs Improvement"
     
-    report_content += f"""
+    parts.append(f"""
 
 ## Model Performance Assessment
 
@@ -183,13 +296,15 @@ These features strongly indicate legitimate job postings:
 
 - **Algorithm**: Logistic Regression with TF-IDF vectorization
 - **Max Features**: 5,000 most important terms
+- **Vocabulary Filtering**: terms in fewer than 5 documents or more than 95% of documents dropped, sublinear TF scaling
 - **Cross-validation**: 80/20 train-test split
 - **Preprocessing**: Text cleaning, stop word removal, lowercasing
 
 ---
 
 *This report was automatically generated by the fraud detection model training pipeline.*
-"""
+""")
+    report_content = ''.join(parts)
     
     # Save the report
     with open('model_evaluation_report.md', 'w', encoding='utf-8') as f:
@@ -197,40 +312,92 @@ These features strongly indicate legitimate job postings:
     
     return report_content
 
-# Combine text columns
-df['text'] = df['title'].fillna('') + ' ' + df['location'].fillna('') + ' ' + df['department'].fillna('') + ' ' + df['company_profile'].fillna('') + ' ' + df['description'].fillna('') + ' ' + df['requirements'].fillna('') + ' ' + df['benefits'].fillna('')
-
-df['text'] = df['text'].apply(clean_text)
-
-# Extract fraud patterns from website documents
-print("Extracting fraud patterns from website documents...")
-fraud_patterns = extract_fraud_patterns_from_sites()
-print(f"Extracted {len(fraud_patterns)} fraud pattern documents")
-
-# Add fraud patterns as additional fraudulent examples
-if fraud_patterns:
-    fraud_df = pd.DataFrame({
-        'text': fraud_patterns,
-        'fraudulent': [1] * len(fraud_patterns)  # Mark as fraudulent
-    })
-    df = pd.concat([df[['text', 'fraudulent']], fraud_df], ignore_index=True)
-    print(f"Total dataset size after adding fraud patterns: {len(df)}")
+os.makedirs(CACHE_DIR, exist_ok=True)
+
+if is_cache_fresh([CLEANED_CACHE], get_source_paths()):
+    print("Loading cleaned dataset from cache...")
+    df = pd.read_parquet(CLEANED_CACHE)
+else:
+    # Load the dataset, reading only the columns the model uses
+    # (the pyarrow engine can't parse the multi-line quoted descriptions, so keep the C engine)
+    df = pd.read_csv(
+        DATASET_PATH,
+        usecols=TEXT_COLUMNS + ['fraudulent'],
+        dtype={**{column: 'string' for column in TEXT_COLUMNS}, 'fraudulent': 'int8'},
+        engine='c'
+    )
+
+    # Combine text columns
+    df['text'] = df[TEXT_COLUMNS[0]].str.cat(df[TEXT_COLUMNS[1:]], sep=' ', na_rep='')
+
+    df['text'] = parallel_clean_text_series(df['text'])
+    df = df[['text', 'fraudulent']]
+
+    # Extract fraud patterns from website documents
+    print("Extracting fraud patterns from website documents...")
+    fraud_patterns = extract_fraud_patterns_from_sites()
+    print(f"Extracted {len(fraud_patterns)} fraud pattern documents")
+
+    # Add fraud patterns as additional fraudulent examples
+    if fraud_patterns:
+        texts = np.concatenate([df['text'].to_numpy(dtype=object), np.asarray(fraud_patterns, dtype=object)])
+        labels = np.concatenate([
+            df['fraudulent'].to_numpy(dtype=np.int8),
+            np.ones(len(fraud_patterns), dtype=np.int8)  # Mark as fraudulent
+        ])
+        df = pd.DataFrame({'text': texts, 'fraudulent': labels})
+        print(f"Total dataset size after adding fraud patterns: {len(df)}")
+
+    df.to_parquet(CLEANED_CACHE)
 
 # Split data
 X_train, X_test, y_train, y_test = train_test_split(df['text'], df['fraudulent'], test_size=0.2, random_state=42)
 
 # Vectorize text
-vectorizer = TfidfVectorizer(max_features=5000)
-X_train_vec = vectorizer.fit_transform(X_train)
-X_test_vec = vectorizer.transform(X_test)
+# TfidfVectorizer (rather than HashingVectorizer) is kept on purpose: the feature
+# importance report and the saved vectorizer both need the term vocabulary.
+# Text is already lowercased and tokenized by clean_text, so split on whitespace
+# instead of re-running sklearn's lowercasing and token regex
+# min_df/max_df drop rare and near-universal terms before the top-5000 cap
+vectorizer = TfidfVectorizer(max_features=5000, min_df=5, max_df=0.95, sublinear_tf=True,
+                             analyzer=str.split, lowercase=False, dtype=np.float32)
+
+train_index = X_train.index.to_numpy()
+test_index = X_test.index.to_numpy()
+
+cached_vectorizer = None
+split_matches = False
+if is_cache_fresh([X_TRAIN_CACHE, X_TEST_CACHE, VECTORIZER_CACHE, SPLIT_CACHE], [CLEANED_CACHE]):
+    cached_vectorizer = joblib.load(VECTORIZER_CACHE)
+    # The cached rows must be in the same order as this run's labels
+    with np.load(SPLIT_CACHE) as cached_split:
+        split_matches = (np.array_equal(cached_split['train'], train_index)
+                         and np.array_equal(cached_split['test'], test_index))
+
+# Reuse cached features only if they were built from the same split with the same vectorizer settings
+if split_matches and cached_vectorizer.get_params() == vectorizer.get_params():
+    print("Loading TF-IDF features from cache...")
+    vectorizer = cached_vectorizer
+    X_train_vec = sparse.load_npz(X_TRAIN_CACHE)
+    X_test_vec = sparse.load_npz(X_TEST_CACHE)
+else:
+    X_train_vec = vectorizer.fit_transform(X_train)
+    X_test_vec = vectorizer.transform(X_test)
+    sparse.save_npz(X_TRAIN_CACHE, X_train_vec, compressed=False)
+    sparse.save_npz(X_TEST_CACHE, X_test_vec, compressed=False)
+    np.savez(SPLIT_CACHE, train=train_index, test=test_index)
+    joblib.dump(vectorizer, VECTORIZER_CACHE)
 
 # Train model
-model = LogisticRegression()
+# liblinear works on the float32 sparse matrix directly; lbfgs would upcast it to float64
+model = LogisticRegression(solver='liblinear', C=1.0)
 model.fit(X_train_vec, y_train)
 
 # Evaluate model with comprehensive metrics
-y_pred = model.predict(X_test_vec)
-y_pred_proba = model.predict_proba(X_test_vec)[:, 1]  # Probabilities for ROC-AUC
+# predict and predict_proba both recompute the decision function, so score once and derive both
+scores = model.decision_function(X_test_vec)
+y_pred = (scores > 0).astype(np.int8)
+y_pred_proba = expit(scores)  # Probabilities for ROC-AUC
 
 # Calculate all metrics
 accuracy = accuracy_score(y_test, y_pred)
@@ -243,8 +410,8 @@ cm = confusion_matrix(y_test, y_pred)
 # Get feature importance (top fraud indicators)
 feature_names = vectorizer.get_feature_names_out()
 feature_importance = model.coef_[0]
-top_fraud_features = sorted(zip(feature_names, feature_importance), key=lambda x: x[1], reverse=True)[:20]
-top_legit_features = sorted(zip(feature_names, feature_importance), key=lambda x: x[1])[:20]
+top_fraud_features = top_weighted_features(feature_names, feature_importance, 20)
+top_legit_features = top_weighted_features(feature_names, feature_importance, 20, largest=False)
 
 # Display results in terminal
 print("\n" + "="*80)
@@ -291,11 +458,8 @@ generate_markdown_report(accuracy, precision, recall, f1, roc_auc, cm,
                         len(df), len(X_train), len(X_test))
 
 # Save the model and vectorizer
-with open('nlp_model.pkl', 'wb') as f:
-    pickle.dump(model, f)
-
-with open('vectorizer.pkl', 'wb') as f:
-    pickle.dump(vectorizer, f)
+joblib.dump(model, 'nlp_model.joblib', compress=3)
+joblib.dump(vectorizer, 'vectorizer.joblib', compress=3)
 
 print("\nModel and vectorizer saved.")
 print("Evaluation report saved as 'model_evaluation_report.md'")
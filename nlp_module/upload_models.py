@@ -2,12 +2,13 @@
 """
 Upload NLP Model Files to Firebase Storage
 
-This script uploads the trained NLP model files (nlp_model.pkl and vectorizer.pkl)
+This script uploads the trained NLP model files (nlp_model.joblib and vectorizer.joblib)
 to Firebase Storage for use by the Chrome extension.
 """
 
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 try:
@@ -22,10 +23,14 @@ except ImportError:
 SERVICE_ACCOUNT_PATH = '/Users/rjmolina13/Documents/Code_Stuff/FRAUDBUSTER-dev/fraudbuster-c59d3-firebase-adminsdk-fbsvc-626440b38d.json'
 STORAGE_BUCKET = 'fraudbuster-c59d3.appspot.com'
 
+# Upload in 8 MB chunks so large models stream instead of being buffered in memory
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+UPLOAD_TIMEOUT = 300
+
 # Model files to upload
 MODEL_FILES = {
-    'nlp_model.pkl': 'models/nlp_model.pkl',
-    'vectorizer.pkl': 'models/vectorizer.pkl'
+    'nlp_model.joblib': 'models/nlp_model.joblib',
+    'vectorizer.joblib': 'models/vectorizer.joblib'
 }
 
 def check_service_account_file():
@@ -80,10 +85,10 @@ def upload_file(local_path, remote_path):
     """Upload a file to Firebase Storage."""
     try:
         bucket = storage.bucket()
-        blob = bucket.blob(remote_path)
+        blob = bucket.blob(remote_path, chunk_size=UPLOAD_CHUNK_SIZE)
         
         print(f"Uploading {local_path} to {remote_path}...")
-        blob.upload_from_filename(local_path)
+        blob.upload_from_filename(local_path, timeout=UPLOAD_TIMEOUT)
         
         # Make the file publicly readable (optional)
         blob.make_public()
@@ -129,14 +134,15 @@ def main():
         print("Please run train_model.py first to generate the model files.")
         return False
     
-    # Upload files
-    success_count = 0
+    # Upload files concurrently; each upload is network-bound
     total_files = len(MODEL_FILES)
     
-    for local_file, remote_path in MODEL_FILES.items():
-        file_path = current_dir / local_file
-        if upload_file(str(file_path), remote_path):
-            success_count += 1
+    with ThreadPoolExecutor(max_workers=total_files) as executor:
+        results = list(executor.map(
+            lambda item: upload_file(str(current_dir / item[0]), item[1]),
+            MODEL_FILES.items()
+        ))
+    success_count = sum(results)
     
     # Summary
     print(f"\n=== Upload Summary ===")
@@ -2,22 +2,29 @@
 """
 Upload NLP Model to Firestore Database
 
-This script converts the trained NLP model files (pickle format) to base64
-and stores them in Firestore along with metadata.
+This script reads the exported NLP model files (JSON format) and stores them
+in the nlp_models collection: metadata, vectorizer and model base documents,
+plus the feature_log_prob and feature_count matrices as float32 shard
+documents (for the extension) and legacy JSON string documents (for older
+extension builds). Fraud URLs from fraud-urls.txt are merged into
+fraud_data/fraud_urls.
 """
 
 import os
 import sys
 import json
+import heapq
+import functools
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from operator import itemgetter
+
+import numpy as np
 
 try:
-    import firebase_admin
-    from firebase_admin import credentials, firestore
+    import orjson  # optional, several times faster on the numeric-heavy model JSON
 except ImportError:
-    print("❌ Error: firebase-admin not installed.")
-    print("Please install it with: pip install firebase-admin")
-    sys.exit(1)
+    orjson = None
 
 # Configuration
 SERVICE_ACCOUNT_PATH = '/Users/rjmolina13/Documents/Code_Stuff/FRAUDBUSTER-dev/fraudbuster-c59d3-firebase-adminsdk-fbsvc-626440b38d.json'
@@ -28,11 +35,27 @@ MODEL_FILES = {
 }
 FRAUD_URLS_FILE = '../fraud-urls.txt'
 FIRESTORE_COLLECTION = 'nlp_models'
+SHARD_MAX_BYTES = 200 * 1024  # keep each shard document far below Firestore's 1 MiB limit
+BATCH_MAX_WRITES = 500  # Firestore's per-batch write limit
+BATCH_MAX_BYTES = 9 * 1024 * 1024  # headroom below the 10 MiB request limit
 FRAUD_DATA_COLLECTION = 'fraud_data'
 
+@functools.lru_cache(maxsize=1)
 def initialize_firebase():
-    """Initialize Firebase Admin SDK"""
+    """Initialize Firebase Admin SDK (once per process)"""
+    # Imported lazily so the file-only helpers work without firebase-admin
+    try:
+        import firebase_admin
+        from firebase_admin import credentials, firestore
+    except ImportError:
+        print("❌ Error: firebase-admin not installed.")
+        print("Please install it with: pip install firebase-admin")
+        sys.exit(1)
+    
     try:
+        if firebase_admin._apps:
+            return firestore.client()
+        
         if not os.path.exists(SERVICE_ACCOUNT_PATH):
             raise FileNotFoundError(f"Service account file not found: {SERVICE_ACCOUNT_PATH}")
         
@@ -49,42 +72,125 @@ def initialize_firebase():
         print(f"❌ Error initializing Firebase: {e}")
         sys.exit(1)
 
+def stat_or_none(file_path):
+    """Return os.stat() of a file, or None if it cannot be stat'ed (like os.path.exists)"""
+    try:
+        return os.stat(file_path)
+    except OSError:
+        return None
+
 def read_json_file(file_path):
     """Read JSON file and return parsed data"""
     try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            json_data = json.load(file)
-            return json_data
+        with open(file_path, 'rb') as file:
+            content = file.read()
+        if orjson:
+            try:
+                return orjson.loads(content)
+            except orjson.JSONDecodeError:
+                pass  # e.g. NaN/Infinity, which json.dump writes by default but orjson rejects
+        json_data = json.loads(content)
+        return json_data
     except Exception as e:
         print(f"❌ Error reading JSON file {file_path}: {e}")
         return None
 
-def get_model_metadata(metadata_path, model_path, vectorizer_path):
-    """Extract metadata from the JSON metadata file and model files"""
+def pack_float32_shards(matrix):
+    """Flatten a 2-D list row-major into little-endian float32 byte shards"""
+    # float32 keeps ~7 significant digits; float16 would round log-probabilities to ~3
+    data = np.asarray(matrix, dtype='<f4').tobytes()
+    itemsize = np.dtype('<f4').itemsize
+    per_shard = SHARD_MAX_BYTES // itemsize
+    count = len(data) // itemsize
+    return [
+        {
+            'data': data[start * itemsize:(start + per_shard) * itemsize],
+            'start': start,
+            'count': min(per_shard, count - start)
+        }
+        for start in range(0, count, per_shard)
+    ]
+
+def stage_float32_matrix(writes, doc_ref, matrix, doc_type, run_timestamp):
+    """Stage a 2-D matrix as float32 shard documents plus a header document; returns the shard count"""
+    shards = pack_float32_shards(matrix)
+    shards_ref = doc_ref.collection('shards')
+    shard_ids = set()
+    for index, shard in enumerate(shards):
+        shard_id = f'{index:04d}'
+        shard_ids.add(shard_id)
+        writes.append((shards_ref.document(shard_id), shard))
+    
+    # The header goes after its shards, so it never points at shards that are not written yet
+    writes.append((doc_ref, {
+        'dtype': 'float32',
+        'byte_order': 'little',
+        'shard_count': len(shards),
+        'type': doc_type,
+        'array_shape': [len(matrix), len(matrix[0]) if matrix else 0],
+        'upload_timestamp': run_timestamp
+    }))
+    
+    # Drop shards left over from an earlier, larger upload
+    for shard_ref in shards_ref.list_documents():
+        if shard_ref.id not in shard_ids:
+            writes.append((shard_ref, None))
+    return len(shards)
+
+def estimate_doc_size(value):
+    """Rough Firestore storage size of a document value, in bytes"""
+    if isinstance(value, dict):
+        return sum(len(key.encode('utf-8')) + 1 + estimate_doc_size(item) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return sum(estimate_doc_size(item) for item in value)
+    if isinstance(value, str):
+        return len(value.encode('utf-8')) + 1
+    if isinstance(value, bytes):
+        return len(value) + 1
+    return 8
+
+def commit_writes(db, writes):
+    """Commit (doc_ref, data) writes, where data None means delete, in as few batches as Firestore allows; returns the batch count"""
+    batch_count = 0
+    batch, batch_writes, batch_bytes = db.batch(), 0, 0
+    for doc_ref, data in writes:
+        size = len(doc_ref.path) + (32 if data is None else estimate_doc_size(data) + 32)
+        if batch_writes and (batch_writes >= BATCH_MAX_WRITES or batch_bytes + size > BATCH_MAX_BYTES):
+            batch.commit()
+            batch_count += 1
+            batch, batch_writes, batch_bytes = db.batch(), 0, 0
+        if data is None:
+            batch.delete(doc_ref)
+        else:
+            batch.set(doc_ref, data)
+        batch_writes += 1
+        batch_bytes += size
+    if batch_writes:
+        batch.commit()
+        batch_count += 1
+    return batch_count
+
+def get_model_metadata(metadata, model_json, vectorizer_json, run_timestamp):
+    """Extract metadata from the parsed metadata, model and vectorizer JSON"""
     try:
-        # Read metadata from JSON file
-        metadata_json = read_json_file(metadata_path)
-        if not metadata_json:
+        if not metadata:
             raise Exception("Could not read metadata JSON file")
         
-        # Add upload timestamp
-        metadata = metadata_json.copy()
-        metadata['upload_timestamp'] = datetime.now().isoformat()
+        # Add upload timestamp (the parsed dict is ours, so no copy is needed)
+        metadata['upload_timestamp'] = run_timestamp
         
-        # Read model JSON to get additional info
-        model_json = read_json_file(model_path)
+        # Use the model JSON to get additional info
         if model_json:
             metadata['model_classes'] = model_json.get('classes', [0, 1])
         
-        # Read vectorizer JSON to get vocabulary info
-        vectorizer_json = read_json_file(vectorizer_path)
+        # Use the vectorizer JSON to get vocabulary info
         if vectorizer_json:
             vocabulary = vectorizer_json.get('vocabulary', {})
             metadata['vocabulary_size'] = len(vocabulary)
             # Store top features for rule-based detection (first 100 by frequency)
             if vocabulary:
-                sorted_features = sorted(vocabulary.items(), key=lambda x: x[1])[:100]
-                metadata['top_features'] = [feature[0] for feature in sorted_features]
+                top_features = heapq.nsmallest(100, vocabulary.items(), key=itemgetter(1))
+                metadata['top_features'] = [feature for feature, _ in top_features]
         
         return metadata
                 
@@ -92,7 +198,7 @@ def get_model_metadata(metadata_path, model_path, vectorizer_path):
         print(f"⚠️  Warning: Could not extract metadata: {e}")
         # Return basic metadata as fallback
         return {
-            'upload_timestamp': datetime.now().isoformat(),
+            'upload_timestamp': run_timestamp,
             'model_type': 'MultinomialNB',
             'vectorizer_type': 'TfidfVectorizer',
             'version': '2.0',
@@ -100,47 +206,63 @@ def get_model_metadata(metadata_path, model_path, vectorizer_path):
         }
 
 def read_fraud_urls(file_path):
-    """Read and parse fraud URLs from text file"""
+    """Read fraud URLs from text file into a set of unique, non-blank URLs"""
     try:
         if not os.path.exists(file_path):
             print(f"❌ Fraud URLs file not found: {file_path}")
             return None
             
         with open(file_path, 'r', encoding='utf-8') as f:
-            urls = [line.strip() for line in f if line.strip()]
+            lines = f.read().splitlines()
+        
+        # Deduplicate while stripping each line only once
+        urls = {url for line in lines if (url := line.strip())}
             
-        print(f"📋 Found {len(urls)} fraud URLs in {file_path}")
+        print(f"📋 Found {len(urls)} unique fraud URLs in {file_path}")
         return urls
         
     except Exception as e:
         print(f"❌ Error reading fraud URLs file: {e}")
         return None
 
+def fetch_fraud_data_urls(db):
+    """Fetch the URL list stored in fraud_data/fraud_urls, skipping the metadata map"""
+    fraud_data_doc = db.collection(FRAUD_DATA_COLLECTION).document('fraud_urls').get(field_paths=['urls'])
+    if fraud_data_doc.exists:
+        data = fraud_data_doc.to_dict()
+        if 'urls' in data and isinstance(data['urls'], list):
+            return data['urls']
+    return []
+
+def fetch_user_reported_urls(db):
+    """Fetch user-reported URLs from the fraud_urls collection, projecting only the url field"""
+    urls = []
+    for doc in db.collection('fraud_urls').select(['url']).stream():
+        doc_data = doc.to_dict()
+        if 'url' in doc_data:
+            urls.append(doc_data['url'])
+    return urls
+
 def fetch_existing_fraud_urls(db):
     """Fetch existing fraud URLs from Firebase collections"""
     print("🔍 Fetching existing fraud URLs from Firebase...")
     existing_urls = set()
     
     try:
-        # Fetch URLs from fraud_data collection (main storage)
-        fraud_data_doc = db.collection(FRAUD_DATA_COLLECTION).document('fraud_urls').get()
-        if fraud_data_doc.exists:
-            data = fraud_data_doc.to_dict()
-            if 'urls' in data and isinstance(data['urls'], list):
-                existing_urls.update(data['urls'])
-                print(f"📋 Found {len(data['urls'])} URLs in fraud_data collection")
-        
-        # Fetch URLs from fraud_urls collection (user reports)
-        fraud_urls_collection = db.collection('fraud_urls').stream()
-        user_reported_count = 0
-        for doc in fraud_urls_collection:
-            doc_data = doc.to_dict()
-            if 'url' in doc_data:
-                existing_urls.add(doc_data['url'])
-                user_reported_count += 1
-        
-        if user_reported_count > 0:
-            print(f"📋 Found {user_reported_count} user-reported URLs in fraud_urls collection")
+        # The two sources are independent, so issue both reads at once
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            fraud_data_future = executor.submit(fetch_fraud_data_urls, db)
+            user_reported_future = executor.submit(fetch_user_reported_urls, db)
+            fraud_data_urls = fraud_data_future.result()
+            user_reported_urls = user_reported_future.result()
+        
+        if fraud_data_urls:
+            existing_urls.update(fraud_data_urls)
+            print(f"📋 Found {len(fraud_data_urls)} URLs in fraud_data collection")
+        
+        if user_reported_urls:
+            existing_urls.update(user_reported_urls)
+            print(f"📋 Found {len(user_reported_urls)} user-reported URLs in fraud_urls collection")
         
         print(f"📊 Total existing unique URLs: {len(existing_urls)}")
         return existing_urls
@@ -150,7 +272,7 @@ def fetch_existing_fraud_urls(db):
         print("📝 Proceeding with empty existing URL set")
         return set()
 
-def upload_fraud_urls_to_firestore(db, new_urls):
+def upload_fraud_urls_to_firestore(db, new_urls_set, run_timestamp):
     """Merge and upload fraud URLs to Firestore, preserving existing user-reported URLs"""
     print("\n=== Merging and Uploading Fraud URLs to Firestore ===")
     
@@ -158,38 +280,38 @@ def upload_fraud_urls_to_firestore(db, new_urls):
         # Fetch existing URLs from Firebase
         existing_urls = fetch_existing_fraud_urls(db)
         
-        # Convert new URLs to set for deduplication
-        new_urls_set = set(new_urls)
-        
         # Calculate merge statistics
+        preserved_count = len(existing_urls)
         truly_new_urls = new_urls_set - existing_urls
-        preserved_urls = existing_urls
-        merged_urls = existing_urls.union(new_urls_set)
+        duplicate_urls = new_urls_set & existing_urls
+        # existing_urls is not needed on its own afterwards, so merge into it
+        existing_urls |= new_urls_set
+        merged_urls = existing_urls
         
         # Display merge statistics
         print(f"\n📊 URL Merge Statistics:")
-        print(f"   🔄 Existing URLs (preserved): {len(preserved_urls)}")
+        print(f"   🔄 Existing URLs (preserved): {preserved_count}")
         print(f"   ➕ New URLs from file: {len(new_urls_set)}")
         print(f"   🆕 Truly new URLs (to be added): {len(truly_new_urls)}")
-        print(f"   🔄 Duplicate URLs (skipped): {len(new_urls_set & existing_urls)}")
+        print(f"   🔄 Duplicate URLs (skipped): {len(duplicate_urls)}")
         print(f"   📊 Total merged URLs: {len(merged_urls)}")
         
         if len(truly_new_urls) > 0:
             print(f"\n🆕 New URLs being added:")
-            for url in sorted(list(truly_new_urls)[:10]):  # Show first 10
+            for url in sorted(truly_new_urls)[:10]:  # Show first 10
                 print(f"   + {url}")
             if len(truly_new_urls) > 10:
                 print(f"   ... and {len(truly_new_urls) - 10} more")
         
         # Prepare merged fraud URLs document data
         fraud_data = {
-            'urls': sorted(list(merged_urls)),  # Sort for consistency
+            'urls': sorted(merged_urls),  # Sort for consistency
             'metadata': {
-                'upload_timestamp': datetime.now().isoformat(),
+                'upload_timestamp': run_timestamp,
                 'url_count': len(merged_urls),
-                'existing_urls_preserved': len(preserved_urls),
+                'existing_urls_preserved': preserved_count,
                 'new_urls_added': len(truly_new_urls),
-                'duplicate_urls_skipped': len(new_urls_set & existing_urls),
+                'duplicate_urls_skipped': len(duplicate_urls),
                 'version': '2.0',
                 'description': 'Known fraudulent job posting domains (merged with user reports)',
                 'sources': ['fraud-urls.txt', 'user_reports', 'fraud_urls_collection']
@@ -204,7 +326,7 @@ def upload_fraud_urls_to_firestore(db, new_urls):
         print("✅ Successfully merged and uploaded fraud URLs to Firestore!")
         print(f"📍 Document path: {FRAUD_DATA_COLLECTION}/fraud_urls")
         print(f"📊 Final URL count: {len(merged_urls)}")
-        print(f"🔒 User-reported URLs preserved: {len(preserved_urls)}")
+        print(f"🔒 User-reported URLs preserved: {preserved_count}")
         print(f"➕ New URLs added: {len(truly_new_urls)}")
         
         return True
@@ -213,7 +335,7 @@ def upload_fraud_urls_to_firestore(db, new_urls):
         print(f"❌ Error merging and uploading fraud URLs to Firestore: {e}")
         return False
 
-def upload_to_firestore(db):
+def upload_to_firestore(db, run_timestamp):
     """Upload NLP model and fraud URLs to Firestore in separate documents"""
     print("\n=== Uploading NLP Model to Firestore ===")
     
@@ -222,47 +344,53 @@ def upload_to_firestore(db):
     vectorizer_path = MODEL_FILES['vectorizer']
     metadata_path = MODEL_FILES['metadata']
     
-    if not os.path.exists(model_path):
+    # One stat per file gives both existence and the size reported in the metadata
+    model_stat = stat_or_none(model_path)
+    if model_stat is None:
         print(f"❌ Model file not found: {model_path}")
         return False
         
-    if not os.path.exists(vectorizer_path):
+    vectorizer_stat = stat_or_none(vectorizer_path)
+    if vectorizer_stat is None:
         print(f"❌ Vectorizer file not found: {vectorizer_path}")
         return False
         
-    if not os.path.exists(metadata_path):
+    metadata_stat = stat_or_none(metadata_path)
+    if metadata_stat is None:
         print(f"❌ Metadata file not found: {metadata_path}")
         return False
     
     try:
-        # Read JSON files directly
-        print(f"📦 Reading {model_path}...")
-        model_data = read_json_file(model_path)
-        if not model_data:
-            return False
-            
-        print(f"📦 Reading {vectorizer_path}...")
-        vectorizer_data = read_json_file(vectorizer_path)
-        if not vectorizer_data:
+        # Read the three JSON files concurrently, each exactly once
+        print(f"📦 Reading {model_path}, {vectorizer_path} and {metadata_path}...")
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            model_data, vectorizer_data, metadata_data = executor.map(
+                read_json_file, [model_path, vectorizer_path, metadata_path])
+        if not model_data or not vectorizer_data:
             return False
         
         # Get model metadata
         print("📊 Reading model metadata...")
-        metadata = get_model_metadata(metadata_path, model_path, vectorizer_path)
+        metadata = get_model_metadata(metadata_data, model_data, vectorizer_data, run_timestamp)
         
         # Calculate file sizes
-        model_size = os.path.getsize(model_path)
-        vectorizer_size = os.path.getsize(vectorizer_path)
-        metadata_size = os.path.getsize(metadata_path)
+        model_size = model_stat.st_size
+        vectorizer_size = vectorizer_stat.st_size
+        metadata_size = metadata_stat.st_size
         
         print(f"🚀 Uploading to Firestore collection '{FIRESTORE_COLLECTION}'...")
         
+        # Stage every model document and commit them together; they fit in a single atomic
+        # batch (one round trip) unless the shards push it past Firestore's batch limits
+        collection = db.collection(FIRESTORE_COLLECTION)
+        writes = []
+        
         # Upload metadata first
         metadata_doc = {
             'metadata': metadata,
             'format': 'json',
             'version': metadata.get('version', '3.0'),
-            'upload_timestamp': datetime.now().isoformat(),
+            'upload_timestamp': run_timestamp,
             'file_sizes': {
                 'model': model_size,
                 'vectorizer': vectorizer_size,
@@ -271,18 +399,18 @@ def upload_to_firestore(db):
             }
         }
         
-        db.collection(FIRESTORE_COLLECTION).document('metadata').set(metadata_doc)
-        print("✅ Metadata uploaded successfully")
+        writes.append((collection.document('metadata'), metadata_doc))
+        print("✅ Metadata staged")
         
         # Upload vectorizer data (smaller, should work)
         vectorizer_doc = {
             'vectorizer_data': vectorizer_data,
             'type': 'vectorizer',
-            'upload_timestamp': datetime.now().isoformat()
+            'upload_timestamp': run_timestamp
         }
         
-        db.collection(FIRESTORE_COLLECTION).document('vectorizer').set(vectorizer_doc)
-        print("✅ Vectorizer uploaded successfully")
+        writes.append((collection.document('vectorizer'), vectorizer_doc))
+        print("✅ Vectorizer staged")
         
         # Split model data into chunks due to Firestore size limits
         # Extract large arrays separately
@@ -293,33 +421,35 @@ def upload_to_firestore(db):
         model_doc = {
             'model_data': model_data,
             'type': 'model_base',
-            'upload_timestamp': datetime.now().isoformat()
+            'upload_timestamp': run_timestamp
         }
         
-        db.collection(FIRESTORE_COLLECTION).document('model_base').set(model_doc)
-        print("✅ Model base data uploaded successfully")
-        
-        # Convert nested arrays to JSON strings to avoid Firestore nested array limitation
-        # Upload feature_log_prob as JSON string
-        feature_log_prob_doc = {
-            'feature_log_prob_json': json.dumps(feature_log_prob),
-            'type': 'feature_log_prob',
-            'array_shape': [len(feature_log_prob), len(feature_log_prob[0]) if feature_log_prob else 0],
-            'upload_timestamp': datetime.now().isoformat()
-        }
-        db.collection(FIRESTORE_COLLECTION).document('feature_log_prob').set(feature_log_prob_doc)
-        print("✅ Feature log prob uploaded as JSON string")
-        
-        # Upload feature_count as JSON string
-        feature_count_doc = {
-            'feature_count_json': json.dumps(feature_count),
-            'type': 'feature_count',
-            'array_shape': [len(feature_count), len(feature_count[0]) if feature_count else 0],
-            'upload_timestamp': datetime.now().isoformat()
-        }
-        db.collection(FIRESTORE_COLLECTION).document('feature_count').set(feature_count_doc)
-        print("✅ Feature count uploaded as JSON string")
+        writes.append((collection.document('model_base'), model_doc))
+        print("✅ Model base data staged")
         
+        # Nested arrays are not allowed in Firestore, so both matrices are packed as float32
+        # bytes split across row-major shard documents under <name>_f32, which current
+        # extension builds read
+        for name, matrix in (('feature_log_prob', feature_log_prob), ('feature_count', feature_count)):
+            shard_count = stage_float32_matrix(writes, collection.document(f'{name}_f32'),
+                                               matrix, name, run_timestamp)
+            print(f"✅ {name} staged as {shard_count} float32 shard(s)")
+            
+            # Installed extension builds that predate the shards still JSON.parse the
+            # original documents, so keep writing them unchanged until those are gone
+            writes.append((collection.document(name), {
+                f'{name}_json': json.dumps(matrix),
+                'type': name,
+                'array_shape': [len(matrix), len(matrix[0]) if matrix else 0],
+                'upload_timestamp': run_timestamp
+            }))
+            print(f"✅ {name} staged as legacy JSON string")
+        
+        # Each document is under the 1 MiB limit, but together they can exceed a batch's
+        # 500 writes or 10 MiB, so commit_writes splits them when needed
+        batch_count = commit_writes(db, writes)
+        if batch_count > 1:
+            print(f"⚠️  {len(writes)} writes needed {batch_count} batches, so the upload was not atomic")
         print("✅ Successfully uploaded model to Firestore!")
         print(f"📍 Collection: {FIRESTORE_COLLECTION}")
         print(f"📊 Model accuracy: {metadata.get('accuracy', 0)*100:.1f}%")
@@ -343,10 +473,13 @@ def main():
     # Initialize Firebase
     db = initialize_firebase()
     
+    # One timestamp for every document written in this run
+    run_timestamp = datetime.now().isoformat()
+    
     # Upload models (complete replacement)
     print("\n=== MODEL UPLOAD (REPLACEMENT) ===")
     print("🔄 Replacing all existing model data with new trained models...")
-    model_success = upload_to_firestore(db)
+    model_success = upload_to_firestore(db, run_timestamp)
     
     # Read and merge fraud URLs (preserving existing)
     print("\n=== FRAUD URL UPLOAD (MERGE) ===")
@@ -355,7 +488,7 @@ def main():
     fraud_success = False
     
     if fraud_urls:
-        fraud_success = upload_fraud_urls_to_firestore(db, fraud_urls)
+        fraud_success = upload_fraud_urls_to_firestore(db, fraud_urls, run_timestamp)
     else:
         print("⚠️  Skipping fraud URLs merge due to read error")
     
@@ -5,10 +5,11 @@ Generate 15 sample job posting pages with a mix of legitimate and fraudulent pos
 
 import random
 import os
+import re
 from datetime import datetime, timedelta
 
 # Legitimate job data
-legitimate_jobs = [
+legitimate_jobs = (
     {
         "title": "Software Engineer - Full Stack",
         "company": "TechCorp Solutions Inc.",
@@ -97,10 +98,10 @@ legitimate_jobs = [
         "benefits": "Employee discount, health insurance after 90 days, paid time off, sales incentives.",
         "contact": "Apply in person or online at retailmax.com/careers"
     }
-]
+)
 
 # Fraudulent job data
-fraudulent_jobs = [
+fraudulent_jobs = (
     {
         "title": "URGENT! Work From Home - $5000/Week GUARANTEED!",
         "company": "Global Opportunities LLC",
@@ -178,9 +179,9 @@ fraudulent_jobs = [
         "benefits": "Unlimited earning potential! Crypto bonuses! Work from anywhere!",
         "contact": "Send Bitcoin payment of 0.02 BTC to wallet: 1ScamWallet123456789 and email transaction ID to: crypto@ponzischeme.biz"
     }
-]
+)
 
-def generate_job_card(job, is_fraud=False):
+def generate_job_card(job):
     """Generate HTML for a single job card."""
     
     return f'''
@@ -219,61 +220,80 @@ def generate_job_card(job, is_fraud=False):
     </div>
     '''
 
-def generate_page(page_num, jobs_on_page):
-    """Generate a complete HTML page."""
-    # Read template
-    with open('template.html', 'r') as f:
-        template = f.read()
+ALL_JOBS = legitimate_jobs + fraudulent_jobs
+# 70% chance of a legitimate job, 30% chance of fraud, spread evenly within each group
+JOB_WEIGHTS = ([0.7 / len(legitimate_jobs)] * len(legitimate_jobs)
+               + [0.3 / len(fraudulent_jobs)] * len(fraudulent_jobs))
+
+# Every page draws from the same job dicts, so render and encode each card only once
+CARD_CACHE = {id(job): generate_job_card(job).encode('utf-8') for job in ALL_JOBS}
+
+PAGE_COUNT = 15
+
+# Navigation links never change, so work out (prev_page, next_page, prev_disabled, next_disabled) up front
+NAV = {
+    page_num: (
+        f"page{page_num-1}.html" if page_num > 1 else "#",
+        f"page{page_num+1}.html" if page_num < PAGE_COUNT else "#",
+        "disabled" if page_num == 1 else "",
+        "disabled" if page_num == PAGE_COUNT else ""
+    )
+    for page_num in range(1, PAGE_COUNT + 1)
+}
+
+# Read the template once; every page is rendered from the same text
+with open('template.html', 'r', encoding='utf-8') as f:
+    raw_template = f.read()
+
+# Convert {{NAME}} placeholders to str.format fields, escaping every other brace (the inline script has some)
+TEMPLATE = re.sub(r'\{\{\{\{(\w+)\}\}\}\}', r'{\1}', raw_template.replace('{', '{{').replace('}', '}}'))
+# The cards go in between, so they can be joined straight into the page without an intermediate string
+TEMPLATE_HEAD, TEMPLATE_TAIL = TEMPLATE.split('{JOB_LISTINGS}')
+
+def iter_page(page_num, jobs_on_page):
+    """Yield a complete HTML page as UTF-8 chunks: header, each job card, footer."""
+    # Navigation logic
+    prev_page, next_page, prev_disabled, next_disabled = NAV[page_num]
     
-    # Generate job listings HTML
-    job_listings_html = ""
-    for job, is_fraud in jobs_on_page:
-        job_listings_html += generate_job_card(job, is_fraud)
+    # Fill the placeholders around the listings; the cards themselves are already encoded
+    subs = {
+        "PAGE_NUMBER": str(page_num),
+        "PREV_PAGE": prev_page,
+        "NEXT_PAGE": next_page,
+        "PREV_DISABLED": prev_disabled,
+        "NEXT_DISABLED": next_disabled
+    }
+    yield TEMPLATE_HEAD.format_map(subs).encode('utf-8')
+    for job in jobs_on_page:
+        yield CARD_CACHE[id(job)]
+    yield TEMPLATE_TAIL.format_map(subs).encode('utf-8')
+
+def build_page(page_num):
+    """Pick the jobs for one page and stream it to disk; returns (filename, job count)."""
+    # A per-page generator keeps each page reproducible on its own
+    rng = random.Random(page_num)
     
-    # Navigation logic
-    prev_page = f"page{page_num-1}.html" if page_num > 1 else "#"
-    next_page = f"page{page_num+1}.html" if page_num < 15 else "#"
-    prev_disabled = "disabled" if page_num == 1 else ""
-    next_disabled = "disabled" if page_num == 15 else ""
+    # Determine number of jobs for this page (5-10)
+    num_jobs = rng.randint(5, 10)
     
-    # Replace placeholders
-    html = template.replace("{{PAGE_NUMBER}}", str(page_num))
-    html = html.replace("{{JOB_LISTINGS}}", job_listings_html)
-    html = html.replace("{{PREV_PAGE}}", prev_page)
-    html = html.replace("{{NEXT_PAGE}}", next_page)
-    html = html.replace("{{PREV_DISABLED}}", prev_disabled)
-    html = html.replace("{{NEXT_DISABLED}}", next_disabled)
+    # Create mix of legitimate and fraudulent jobs in one weighted draw
+    jobs_on_page = rng.choices(ALL_JOBS, JOB_WEIGHTS, k=num_jobs)
     
-    return html
+    # Write the page chunk by chunk, so it is never held in memory as a whole
+    filename = f"page{page_num}.html"
+    with open(filename, 'wb') as f:
+        f.writelines(iter_page(page_num, jobs_on_page))
+    return filename, num_jobs
 
 def main():
     """Generate all 15 pages."""
     print("Generating 15 job posting pages...")
     
-    for page_num in range(1, 16):
-        # Determine number of jobs for this page (5-10)
-        num_jobs = random.randint(5, 10)
-        
-        # Create mix of legitimate and fraudulent jobs
-        jobs_on_page = []
-        
-        for _ in range(num_jobs):
-            # 70% chance of legitimate job, 30% chance of fraud
-            if random.random() < 0.7:
-                job = random.choice(legitimate_jobs)
-                jobs_on_page.append((job, False))
-            else:
-                job = random.choice(fraudulent_jobs)
-                jobs_on_page.append((job, True))
-        
-        # Generate page HTML
-        page_html = generate_page(page_num, jobs_on_page)
-        
-        # Write to file
-        filename = f"page{page_num}.html"
-        with open(filename, 'w') as f:
-            f.write(page_html)
-        
+    # Note: a process pool was tried here and was slower; all 15 pages build in a
+    # few milliseconds, well under the cost of starting workers (which, under
+    # spawn, also re-read the template and rebuild CARD_CACHE)
+    for page_num in range(1, PAGE_COUNT + 1):
+        filename, num_jobs = build_page(page_num)
         print(f"Generated {filename} with {num_jobs} job postings")
     
     print("\nAll pages generated successfully!")